@@ -3,6 +3,12 @@
 import sys
 from typing import TextIO
 
+_BOX_STYLES = {
+    "rounded": ("╭", "╮", "╰", "╯", "─", "│"),
+    "square": ("┌", "┐", "└", "┘", "─", "│"),
+    "double": ("╔", "╗", "╚", "╝", "═", "║"),
+}
+
 
 def print_box(
     lines: list[str],
@@ -20,17 +26,17 @@ def print_box(
         style: Box style - "rounded", "square", or "double"
         file: Output stream (default: stderr)
     """
-    styles = {
-        "rounded": ("╭", "╮", "╰", "╯", "─", "│"),
-        "square": ("┌", "┐", "└", "┘", "─", "│"),
-        "double": ("╔", "╗", "╚", "╝", "═", "║"),
-    }
-    tl, tr, bl, br, h, v = styles.get(style, styles["rounded"])
+    tl, tr, bl, br, h, v = _BOX_STYLES.get(style) or _BOX_STYLES["rounded"]
 
     # Calculate box width
-    width = max(len(line) for line in lines) + 4
+    width = max(map(len, lines)) + 4
     if title:
         width = max(width, len(title) + 6)
+    border = h * width
+
+    # Build the whole box in memory, then emit with a single write so the
+    # unbuffered stderr stream sees one syscall instead of one per line
+    parts: list[str] = []
 
     # Top border with optional title
     if title:
@@ -38,24 +44,24 @@ def print_box(
         remaining = width - len(title_segment)
         left_border = h * (remaining // 2)
         right_border = h * (remaining - remaining // 2)
-        print(f"{tl}{left_border}{title_segment}{right_border}{tr}", file=file)
+        parts.append(f"{tl}{left_border}{title_segment}{right_border}{tr}")
     else:
-        print(f"{tl}{h * width}{tr}", file=file)
+        parts.append(f"{tl}{border}{tr}")
 
     # Top padding
-    print(f"{v}{' ' * width}{v}", file=file)
+    pad = f"{v}{' ' * width}{v}"
+    parts.append(pad)
 
     # Content lines
-    for line in lines:
-        padding = width - len(line) - 2
-        print(f"{v}  {line}{' ' * padding}{v}", file=file)
+    parts.extend(f"{v}  {line}{' ' * (width - len(line) - 2)}{v}" for line in lines)
 
-    # Bottom padding
-    print(f"{v}{' ' * width}{v}", file=file)
+    # Bottom padding and border
+    parts.append(pad)
+    parts.append(f"{bl}{border}{br}")
 
-    # Bottom border
-    print(f"{bl}{h * width}{br}", file=file)
-    print(file=file)
+    file.write("\n".join(parts) + "\n\n")
+    if hasattr(file, "flush"):
+        file.flush()
 
 
 def print_error_box(message: str, details: list[str] | None = None, **kwargs):
@@ -1,6 +1,8 @@
 """Environment loading utilities for Claude Code skills."""
 
+import functools
 import os
+import re
 import sys
 from pathlib import Path
 
@@ -9,33 +11,36 @@ from box import print_error_box
 ENV_LOCAL = Path.home() / ".env" / "local"
 ENV_SERVICES = Path.home() / ".env" / "services"
 
+# KEY=value lines; comments never match since "#" can't start an identifier.
+# Whitespace must stay horizontal ([ \t], not \s) or an empty value would
+# swallow the following line in multiline mode.
+_ENV_LINE_RE = re.compile(r"^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t]*$", re.M)
+
 
 def load_env_local():
     """Load environment variables from ~/.env/local."""
     if ENV_LOCAL.exists():
-        with open(ENV_LOCAL) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    value = value.strip().replace("~", str(Path.home()))
-                    if key not in os.environ:
-                        os.environ[key] = value
+        for match in _ENV_LINE_RE.finditer(ENV_LOCAL.read_text()):
+            key, value = match.group(1), match.group(2)
+            if key not in os.environ:
+                os.environ[key] = value.replace("~", str(Path.home()))
+
+
+@functools.lru_cache(maxsize=32)
+def _load_env_file_cached(path_str: str, mtime_ns: int) -> tuple[tuple[str, str], ...]:
+    """Parse an env file, cached on (path, mtime) so repeat reads are free."""
+    text = Path(path_str).read_text()
+    return tuple((m.group(1), m.group(2).strip("'\"")) for m in _ENV_LINE_RE.finditer(text))
 
 
 def load_env_file(path: str | Path) -> dict[str, str]:
     """Load environment variables from a file, returning as dict."""
     path = Path(path).expanduser()
-    env_vars = {}
-    if path.exists():
-        with open(path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    value = value.strip().strip("'\"")
-                    env_vars[key] = value
-    return env_vars
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return {}
+    return dict(_load_env_file_cached(str(path), mtime_ns))
 
 
 def require_env(
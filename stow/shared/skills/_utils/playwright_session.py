@@ -5,8 +5,10 @@ Spawns Playwright MCP as subprocess, communicates via JSON-RPC over stdin/stdout
 """
 
 import base64
+import io
 import json
-import queue
+import os
+import selectors
 import subprocess
 import sys
 import threading
@@ -14,12 +16,50 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+# orjson is 2-5x faster on the big snapshot payloads and emits bytes
+# directly; fall back to stdlib json when it isn't installed
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _loads = json.loads
+
+
+# Resolved Chromium path cache: first line is the browser cache dir's
+# mtime_ns when the path was recorded, second line is the path itself
+_CHROMIUM_CACHE = Path.home() / ".cache" / "playwright-session" / "chromium-path"
+
+
+def find_chromium_executable(refresh: bool = False) -> str | None:
+    """Find Playwright's installed Chromium executable.
+
+    The resolved path is cached via PLAYWRIGHT_CHROMIUM_PATH or a small
+    file keyed by the ms-playwright directory's mtime, so repeat startups
+    skip re-scanning every chromium-* install. Pass refresh=True to force
+    a rescan.
+    """
+    env_path = os.environ.get("PLAYWRIGHT_CHROMIUM_PATH")
+    if not refresh and env_path and Path(env_path).exists():
+        return env_path
 
-def find_chromium_executable() -> str | None:
-    """Find Playwright's installed Chromium executable."""
     cache_dir = Path.home() / "Library/Caches/ms-playwright"
     if not cache_dir.exists():
         return None
+    cache_mtime = cache_dir.stat().st_mtime_ns
+
+    if not refresh and _CHROMIUM_CACHE.exists():
+        try:
+            recorded_mtime, cached_path = _CHROMIUM_CACHE.read_text().splitlines()[:2]
+            if int(recorded_mtime) == cache_mtime and Path(cached_path).exists():
+                return cached_path
+        except (OSError, ValueError):
+            pass
 
     chromium_dirs = sorted(
         cache_dir.glob("chromium-*"), key=lambda p: p.stat().st_mtime, reverse=True
@@ -27,25 +67,116 @@ def find_chromium_executable() -> str | None:
     for chromium_dir in chromium_dirs:
         mac_path = chromium_dir / "chrome-mac/Chromium.app/Contents/MacOS/Chromium"
         if mac_path.exists():
-            return str(mac_path)
+            return _record_chromium_path(str(mac_path), cache_mtime)
         linux_path = chromium_dir / "chrome-linux/chrome"
         if linux_path.exists():
-            return str(linux_path)
+            return _record_chromium_path(str(linux_path), cache_mtime)
     return None
 
 
+def _record_chromium_path(path: str, cache_mtime: int) -> str:
+    """Atomically persist the resolved Chromium path for future startups."""
+    try:
+        _CHROMIUM_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _CHROMIUM_CACHE.with_suffix(".tmp")
+        tmp.write_text(f"{cache_mtime}\n{path}\n")
+        os.replace(tmp, _CHROMIUM_CACHE)
+    except OSError:
+        pass
+    return path
+
+
+class BatchResult:
+    """Handle for one call queued in a PlaywrightSession.batch() block."""
+
+    def __init__(self):
+        self.response: dict[str, Any] | None = None
+
+    def result(self) -> dict[str, Any]:
+        if self.response is None:
+            raise RuntimeError("Batch has not been flushed yet")
+        return self.response
+
+
+class Batch:
+    """Queues JSON-RPC calls and flushes them as a single batch request.
+
+    JSON-RPC 2.0 allows an array of request objects to be answered with
+    an array of responses, so N queued calls cost one write/read cycle
+    instead of N round-trips.
+    """
+
+    def __init__(self, session: "PlaywrightSession", timeout: int):
+        self.session = session
+        self.timeout = timeout
+        self._requests: list[dict[str, Any]] = []
+        self._slots: list[tuple[int, list, BatchResult]] = []
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def call_tool(self, name: str, arguments: dict[str, Any]) -> BatchResult:
+        """Queue a Playwright tool call; resolved when the batch flushes."""
+        return self._queue("tools/call", {"name": name, "arguments": arguments})
+
+    def _queue(self, method: str, params: dict[str, Any] | None) -> BatchResult:
+        session = self.session
+        if not session.process or not session.process.stdin:
+            raise RuntimeError("Server not started")
+        msg_id = session.msg_id
+        session.msg_id += 1
+        slot = [None, threading.Event()]
+        session.pending_responses[msg_id] = slot
+        self._requests.append(
+            {"jsonrpc": "2.0", "method": method, "params": params or {}, "id": msg_id}
+        )
+        result = BatchResult()
+        self._slots.append((msg_id, slot, result))
+        return result
+
+    def flush(self):
+        """Send all queued calls as one array and collect their responses."""
+        if not self._requests:
+            return
+        session = self.session
+        try:
+            session.process.stdin.write(_dumps(self._requests) + b"\n")
+            session.process.stdin.flush()
+        except Exception as e:
+            for msg_id, _, _ in self._slots:
+                session.pending_responses.pop(msg_id, None)
+            self._requests, self._slots = [], []
+            raise RuntimeError(f"Send failed: {e}")
+
+        try:
+            for msg_id, slot, result in self._slots:
+                if not slot[1].wait(self.timeout):
+                    raise TimeoutError(f"Batch request {msg_id} timed out after {self.timeout}s")
+                result.response = slot[0]
+        finally:
+            for msg_id, _, _ in self._slots:
+                session.pending_responses.pop(msg_id, None)
+            self._requests, self._slots = [], []
+
+
 class PlaywrightSession:
     """Manages a persistent Playwright MCP browser session."""
 
     def __init__(self, output_dir: str | None = None):
         self.process: subprocess.Popen | None = None
         self.msg_id = 1
-        self.pending_responses: dict[int, queue.Queue] = {}
-        self.stdout_thread: threading.Thread | None = None
-        self.stderr_thread: threading.Thread | None = None
+        # msg id -> [response, Event]; lighter than a queue.Queue per request
+        self.pending_responses: dict[int, list] = {}
+        self.reader_thread: threading.Thread | None = None
         self.running = False
+        # Created lazily on first screenshot; sessions that never capture
+        # one shouldn't touch the filesystem
         self.output_dir = Path(output_dir) if output_dir else Path.cwd()
-        self.output_dir.mkdir(parents=True, exist_ok=True)
 
     def start(self, headless: bool = False) -> "PlaywrightSession":
         """Start Playwright MCP server."""
@@ -67,15 +198,12 @@ class PlaywrightSession:
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
+                bufsize=64 * 1024,
             )
 
             self.running = True
-            self.stdout_thread = threading.Thread(target=self._read_stdout, daemon=True)
-            self.stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
-            self.stdout_thread.start()
-            self.stderr_thread.start()
+            self.reader_thread = threading.Thread(target=self._read_streams, daemon=True)
+            self.reader_thread.start()
 
             self._initialize()
             print(f"Browser ready. Screenshots: {self.output_dir}\n")
@@ -88,27 +216,67 @@ class PlaywrightSession:
             print(f"ERROR: {e}")
             sys.exit(1)
 
-    def _read_stdout(self):
-        if not self.process or not self.process.stdout:
+    def _read_streams(self):
+        """Multiplex stdout and stderr in one thread via a selector."""
+        if not self.process or not self.process.stdout or not self.process.stderr:
             return
-        for line in self.process.stdout:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                msg = json.loads(line)
-                if "id" in msg and msg["id"] in self.pending_responses:
-                    self.pending_responses[msg["id"]].put(msg)
-            except json.JSONDecodeError:
-                pass
-
-    def _read_stderr(self):
-        if not self.process or not self.process.stderr:
+        out_fd = self.process.stdout.fileno()
+        err_fd = self.process.stderr.fileno()
+        sel = selectors.DefaultSelector()
+        for fd in (out_fd, err_fd):
+            os.set_blocking(fd, False)
+            sel.register(fd, selectors.EVENT_READ)
+        buffers = {out_fd: b"", err_fd: b""}
+
+        while self.running and buffers:
+            for key, _ in sel.select(timeout=1):
+                fd = key.fileobj
+                try:
+                    chunk = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    chunk = b""
+                if not chunk:
+                    sel.unregister(fd)
+                    del buffers[fd]
+                    continue
+                *lines, buffers[fd] = (buffers[fd] + chunk).split(b"\n")
+                for raw in lines:
+                    if fd == out_fd:
+                        self._handle_stdout_line(raw)
+                    else:
+                        self._handle_stderr_line(raw)
+        sel.close()
+
+    def _handle_stdout_line(self, raw: bytes):
+        line = raw.strip()
+        if not line:
+            return
+        try:
+            # Both orjson and stdlib json parse bytes directly, so skip the
+            # intermediate str and its extra UTF-8 pass
+            msg = _loads(line)
+        except ValueError:
             return
-        for line in self.process.stderr:
-            line = line.strip()
-            if line and "Debugger" not in line:
-                print(f"[browser] {line}", file=sys.stderr)
+        # A batch request comes back as an array of responses on one line
+        if isinstance(msg, list):
+            for entry in msg:
+                self._dispatch_response(entry)
+        else:
+            self._dispatch_response(msg)
+
+    def _dispatch_response(self, msg: Any):
+        if isinstance(msg, dict) and "id" in msg:
+            slot = self.pending_responses.get(msg["id"])
+            if slot:
+                slot[0] = msg
+                slot[1].set()
+
+    def _handle_stderr_line(self, raw: bytes):
+        line = raw.decode("utf-8", "replace").strip()
+        if line and "Debugger" not in line:
+            print(f"[browser] {line}", file=sys.stderr)
 
     def _initialize(self):
         response = self._send_request(
@@ -130,30 +298,42 @@ class PlaywrightSession:
 
         msg_id = self.msg_id
         self.msg_id += 1
-        response_queue: queue.Queue = queue.Queue()
-        self.pending_responses[msg_id] = response_queue
+        slot = [None, threading.Event()]
+        self.pending_responses[msg_id] = slot
 
         request = {"jsonrpc": "2.0", "method": method, "params": params or {}, "id": msg_id}
 
         try:
-            self.process.stdin.write(json.dumps(request) + "\n")
+            # One buffered write + flush = one syscall per request, instead of
+            # the write-per-newline behavior of a line-buffered text pipe
+            self.process.stdin.write(_dumps(request) + b"\n")
             self.process.stdin.flush()
         except Exception as e:
             del self.pending_responses[msg_id]
             raise RuntimeError(f"Send failed: {e}")
 
         try:
-            response = response_queue.get(timeout=timeout)
-            del self.pending_responses[msg_id]
-            return response
-        except queue.Empty:
+            if not slot[1].wait(timeout):
+                raise TimeoutError(f"Request timed out after {timeout}s")
+            return slot[0]
+        finally:
             del self.pending_responses[msg_id]
-            raise TimeoutError(f"Request timed out after {timeout}s")
 
     def call_tool(self, name: str, arguments: dict[str, Any], timeout: int = 60) -> dict[str, Any]:
         """Call a Playwright tool."""
         return self._send_request("tools/call", {"name": name, "arguments": arguments}, timeout)
 
+    def batch(self, timeout: int = 60) -> Batch:
+        """Group several tool calls into one JSON-RPC batch round-trip.
+
+        Usage:
+            with session.batch() as b:
+                click = b.call_tool("browser_click", {...})
+                snap = b.call_tool("browser_snapshot", {})
+            snap.result()
+        """
+        return Batch(self, timeout)
+
     def navigate(self, url: str) -> str:
         """Navigate to URL, return page snapshot."""
         result = self.call_tool("browser_navigate", {"url": url})
@@ -183,14 +363,17 @@ class PlaywrightSession:
         if not name.endswith(".png"):
             name += ".png"
 
+        self.output_dir.mkdir(parents=True, exist_ok=True)
         filepath = self.output_dir / name
         result = self.call_tool("browser_take_screenshot", {"fullPage": full_page})
 
         if "result" in result and "content" in result["result"]:
             for item in result["result"]["content"]:
                 if item.get("type") == "image":
-                    img_data = base64.b64decode(item.get("data", ""))
-                    filepath.write_bytes(img_data)
+                    # Stream the decode straight to disk so the decoded PNG
+                    # is never materialized as a second in-memory copy
+                    with open(filepath, "wb") as f:
+                        base64.decode(io.BytesIO(item.get("data", "").encode("ascii")), f)
                     print(f"Screenshot saved: {filepath}")
                     return str(filepath)
 
@@ -5,16 +5,24 @@ Provides OpenRouter API access with LMArena model selection.
 """
 
 import base64
+import functools
+import http.client
+import io
 import json
+import mmap
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Iterator
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
-OPENROUTER_BASE = "https://openrouter.ai/api/v1"
+OPENROUTER_HOST = "openrouter.ai"
+OPENROUTER_BASE_PATH = "/api/v1"
 LMARENA_VISION_URL = "https://lmarena.ai/leaderboard/vision"
 ENV_FILE = Path.home() / ".env" / "models"
 CACHE_DIR = Path.home() / ".cache" / "vision-api"
@@ -62,6 +70,75 @@ MODEL_MAPPINGS = {
 }
 
 
+# Persistent per-thread connections to OpenRouter so back-to-back calls
+# reuse the TCP+TLS session instead of paying a full handshake per
+# request, while concurrent batch workers stay fully parallel instead of
+# serializing on a shared connection
+_or_local = threading.local()
+
+
+def _openrouter_request(
+    method: str,
+    path: str,
+    body: bytes | None = None,
+    headers: dict[str, str] | None = None,
+) -> tuple[int, bytes]:
+    """Issue a request to OpenRouter over a persistent HTTPS connection.
+
+    Returns (status, response_body). Transparently reconnects once if the
+    server closed the idle connection between calls.
+    """
+    for attempt in range(2):
+        conn = getattr(_or_local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPSConnection(OPENROUTER_HOST, timeout=120)
+            _or_local.conn = conn
+        try:
+            conn.request(method, f"{OPENROUTER_BASE_PATH}{path}", body, headers or {})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            _or_local.conn = None
+            if attempt:
+                raise
+
+
+# All mapping keys as one alternation, longest first so the most specific
+# key wins, replacing the per-key substring loop with a single C-level scan
+_MAPPING_RE = re.compile(
+    "|".join(re.escape(k) for k in sorted(MODEL_MAPPINGS, key=len, reverse=True))
+)
+
+# Known-model fallback list for the LMArena scrape (prioritize Google
+# models as they currently lead)
+_KNOWN_MODELS = [
+    "gemini-3",
+    "gemini-2.5",
+    "gemini-2",
+    "gpt-5",
+    "gpt-4o",
+    "gpt-4.5",
+    "claude-opus",
+    "claude-3.5-sonnet",
+    "claude-3-opus",
+    "grok-4",
+    "grok-3",
+    "llama-4",
+    "llama-3.2",
+]
+
+# Patterns like: "model":"gemini-3-pro","rating":1309.49
+_RATING_RE = re.compile(r'"(?:model|name)"\s*:\s*"([^"]+)"[^}]*"rating"\s*:\s*([\d.]+)')
+# One precompiled pattern per known model, searched in priority order (a
+# single alternation would return the leftmost hit in the page instead)
+_KNOWN_MODEL_RES = [
+    re.compile(r"\b(" + re.escape(m) + r"[A-Za-z0-9\-\._]*)\b", re.IGNORECASE)
+    for m in _KNOWN_MODELS
+]
+
+
+@functools.cache
 def load_api_key() -> str:
     """Load OpenRouter API key from ~/.env/models or environment."""
     if ENV_FILE.exists():
@@ -74,6 +151,38 @@ def load_api_key() -> str:
     raise ValueError("No OPENROUTER_API_KEY found in ~/.env/models or environment")
 
 
+# Pillow enables client-side downscaling before upload; optional
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Vision models downscale internally to roughly this resolution, so
+# anything larger just wastes upload bytes and billed tokens
+_MAX_IMAGE_DIM = 2048
+
+
+def _downscale_image(path: Path, max_dim: int = _MAX_IMAGE_DIM) -> tuple[bytes, str] | None:
+    """Resize an oversized image and re-encode it as WebP.
+
+    Returns (image_bytes, media_type), or None when Pillow is missing,
+    the image already fits, or it cannot be processed (caller then sends
+    the original file unchanged).
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            if max(img.size) <= max_dim:
+                return None
+            img.thumbnail((max_dim, max_dim))
+            buf = io.BytesIO()
+            img.save(buf, "WEBP", quality=85, method=6)
+            return buf.getvalue(), "image/webp"
+    except (OSError, ValueError):
+        return None
+
+
 def encode_image(image_path: str) -> tuple[str, str]:
     """Encode image to base64 and detect media type."""
     path = Path(image_path)
@@ -90,12 +199,51 @@ def encode_image(image_path: str) -> tuple[str, str]:
     }
     media_type = media_types.get(suffix, "image/png")
 
+    if path.stat().st_size == 0:
+        return "", media_type
+
+    scaled = _downscale_image(path)
+    if scaled is not None:
+        return base64.b64encode(scaled[0]).decode("ascii"), scaled[1]
+
+    # mmap instead of read() so the raw bytes are never fully resident
+    # alongside the encoded copy (halves peak memory on big screenshots)
     with open(path, "rb") as f:
-        data = base64.b64encode(f.read()).decode("utf-8")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = base64.b64encode(mm).decode("ascii")
 
     return data, media_type
 
 
+_cache_dir_ready = False
+
+
+def _ensure_cache_dir():
+    """Create CACHE_DIR once per process instead of per cache access."""
+    global _cache_dir_ready
+    if not _cache_dir_ready:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _cache_dir_ready = True
+
+
+def _read_cache(path: Path, ttl: int) -> dict | None:
+    """Return the parsed cache file if it is fresher than ttl, else None.
+
+    Checks mtime via stat before reading so a stale cache costs one
+    syscall instead of a full read plus JSON parse.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if time.time() - st.st_mtime > ttl:
+        return None
+    try:
+        return json.loads(path.read_bytes())
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
 def scrape_lmarena_vision_top() -> str | None:
     """Scrape LMArena Vision leaderboard for the #1 ranked model."""
     headers = {
@@ -109,36 +257,13 @@ def scrape_lmarena_vision_top() -> str | None:
             html = resp.read().decode("utf-8")
 
         # Try to parse JSON rating data embedded in the page
-        # Look for patterns like: "model":"gemini-3-pro","rating":1309.49
-        rating_pattern = r'"(?:model|name)"\s*:\s*"([^"]+)"[^}]*"rating"\s*:\s*([\d.]+)'
-        matches = re.findall(rating_pattern, html)
+        matches = _RATING_RE.findall(html)
         if matches:
-            # Sort by rating descending and return the highest
-            models_with_ratings = [(name, float(rating)) for name, rating in matches]
-            models_with_ratings.sort(key=lambda x: x[1], reverse=True)
-            top_model = models_with_ratings[0][0]
-            return top_model
-
-        # Fallback to known model list (prioritize Google models as they currently lead)
-        known_models = [
-            "gemini-3",
-            "gemini-2.5",
-            "gemini-2",
-            "gpt-5",
-            "gpt-4o",
-            "gpt-4.5",
-            "claude-opus",
-            "claude-3.5-sonnet",
-            "claude-3-opus",
-            "grok-4",
-            "grok-3",
-            "llama-4",
-            "llama-3.2",
-        ]
-
-        for model in known_models:
-            pattern = rf"\b({re.escape(model)}[A-Za-z0-9\-\._]*)\b"
-            match = re.search(pattern, html, re.IGNORECASE)
+            return max(matches, key=lambda x: float(x[1]))[0]
+
+        # Fallback to known model list, highest priority first
+        for pattern in _KNOWN_MODEL_RES:
+            match = pattern.search(html)
             if match:
                 return match.group(1)
 
@@ -151,15 +276,11 @@ def scrape_lmarena_vision_top() -> str | None:
 
 def get_lmarena_top_vision_model(config_file: Path | None = None) -> str | None:
     """Get the #1 ranked vision model from LMArena with caching."""
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _ensure_cache_dir()
 
-    if LMARENA_CACHE.exists():
-        try:
-            cache = json.loads(LMARENA_CACHE.read_text())
-            if time.time() - cache.get("timestamp", 0) < CACHE_TTL:
-                return cache.get("model")
-        except (json.JSONDecodeError, KeyError):
-            pass
+    cache = _read_cache(LMARENA_CACHE, CACHE_TTL)
+    if cache is not None:
+        return cache.get("model")
 
     # Check manual override config if provided
     if config_file and config_file.exists():
@@ -195,8 +316,13 @@ def map_to_openrouter_id(lmarena_name: str) -> str | None:
     if name_lower in MODEL_MAPPINGS:
         return MODEL_MAPPINGS[name_lower]
 
+    match = _MAPPING_RE.search(name_lower)
+    if match:
+        return MODEL_MAPPINGS[match.group(0)]
+
+    # Reverse direction: the scraped name is a fragment of a mapping key
     for key, value in MODEL_MAPPINGS.items():
-        if key in name_lower or name_lower in key:
+        if name_lower in key:
             return value
 
     if "/" in lmarena_name:
@@ -211,10 +337,10 @@ def fetch_openrouter_vision_models(api_key: str) -> list[dict]:
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    req = Request(f"{OPENROUTER_BASE}/models", headers=headers, method="GET")
-
-    with urlopen(req, timeout=30) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
+    status, raw = _openrouter_request("GET", "/models", headers=headers)
+    if status != 200:
+        raise RuntimeError(f"OpenRouter API error ({status}): {raw.decode('utf-8', 'replace')}")
+    data = json.loads(raw)
 
     vision_models = []
     for model in data.get("data", []):
@@ -236,15 +362,11 @@ def fetch_openrouter_vision_models(api_key: str) -> list[dict]:
 def get_openrouter_vision_models() -> list[dict]:
     """Get vision models from OpenRouter with caching."""
     api_key = load_api_key()
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _ensure_cache_dir()
 
-    if OPENROUTER_CACHE.exists():
-        try:
-            cache = json.loads(OPENROUTER_CACHE.read_text())
-            if time.time() - cache.get("timestamp", 0) < CACHE_TTL:
-                return cache.get("models", [])
-        except (json.JSONDecodeError, KeyError):
-            pass
+    cache = _read_cache(OPENROUTER_CACHE, CACHE_TTL)
+    if cache is not None:
+        return cache.get("models", [])
 
     models = fetch_openrouter_vision_models(api_key)
     OPENROUTER_CACHE.write_text(
@@ -259,6 +381,12 @@ def get_openrouter_vision_models() -> list[dict]:
     return models
 
 
+@functools.cache
+def _openrouter_model_ids() -> frozenset[str]:
+    """Available OpenRouter model ids, built once per process."""
+    return frozenset(m["id"] for m in get_openrouter_vision_models())
+
+
 def get_best_vision_model(config_file: Path | None = None) -> str:
     """
     Get the best vision model by:
@@ -266,14 +394,19 @@ def get_best_vision_model(config_file: Path | None = None) -> str:
     2. Map to OpenRouter ID
     3. Verify model exists on OpenRouter
     4. Fallback to best available on OpenRouter
+
+    Resolved once per process per config file; repeat calls are cached.
     """
-    lmarena_top = get_lmarena_top_vision_model(config_file)
+    return _best_vision_model_cached(str(config_file) if config_file else None)
+
+
+@functools.cache
+def _best_vision_model_cached(config_file: str | None) -> str:
+    lmarena_top = get_lmarena_top_vision_model(Path(config_file) if config_file else None)
     if lmarena_top:
         openrouter_id = map_to_openrouter_id(lmarena_top)
         if openrouter_id:
-            models = get_openrouter_vision_models()
-            model_ids = {m["id"] for m in models}
-            if openrouter_id in model_ids:
+            if openrouter_id in _openrouter_model_ids():
                 print(f"Using LMArena #1: {lmarena_top} -> {openrouter_id}", file=sys.stderr)
                 return openrouter_id
 
@@ -286,8 +419,7 @@ def get_best_vision_model(config_file: Path | None = None) -> str:
         is_paid = prompt_cost > 0
         return (not is_paid, -m.get("context_length", 0))
 
-    models_sorted = sorted(models, key=sort_key)
-    fallback = models_sorted[0]["id"]
+    fallback = min(models, key=sort_key)["id"]
     print(f"Fallback to OpenRouter best: {fallback}", file=sys.stderr)
     return fallback
 
@@ -297,29 +429,91 @@ def call_vision_api(
     prompt: str,
     model: str | None = None,
     max_tokens: int = 4096,
+    encoded: tuple[str, str] | None = None,
 ) -> str:
-    """Call vision API with a single image and prompt."""
+    """Call vision API with a single image and prompt.
+
+    Pass encoded=(base64_data, media_type) to reuse an existing encoding
+    instead of re-reading the file.
+    """
     api_key = load_api_key()
     model = model or get_best_vision_model()
 
-    image_data, media_type = encode_image(image_path)
+    image_data, media_type = encoded or encode_image(image_path)
+    return _post_image_prompt(api_key, model, image_data, media_type, prompt, max_tokens)
 
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:{media_type};base64,{image_data}"},
-                    },
-                    {"type": "text", "text": prompt},
-                ],
-            }
-        ],
-        "max_tokens": max_tokens,
-    }
+
+# Identical requests already in flight share one HTTP call: the first
+# caller owns the request, concurrent duplicates block on its Future.
+# Keys hold the full image data, but str hashes are cached by the
+# interpreter and batch callers pass the same string object, so lookups
+# stay cheap.
+_inflight: dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _post_image_prompt(
+    api_key: str,
+    model: str,
+    image_data: str,
+    media_type: str,
+    prompt: str,
+    max_tokens: int,
+) -> str:
+    """POST one pre-encoded image + prompt, deduplicating concurrent twins.
+
+    If an identical (model, image, prompt, max_tokens) request is already
+    in flight, wait on its result instead of firing a second HTTP call.
+    Failures propagate to every waiter.
+    """
+    key = (model, media_type, image_data, prompt, max_tokens)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            owner = False
+        else:
+            future = Future()
+            _inflight[key] = future
+            owner = True
+    if not owner:
+        return future.result()
+    try:
+        result = _send_image_prompt(api_key, model, image_data, media_type, prompt, max_tokens)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _send_image_prompt(
+    api_key: str,
+    model: str,
+    image_data: str,
+    media_type: str,
+    prompt: str,
+    max_tokens: int,
+) -> str:
+    """POST one pre-encoded image + prompt to chat/completions."""
+    # The base64 alphabet contains no JSON-special characters, so splice the
+    # encoded image into a handwritten body instead of letting json.dumps
+    # escape-scan the multi-MB string
+    body = (
+        b'{"model":%s,"messages":[{"role":"user","content":['
+        b'{"type":"image_url","image_url":{"url":"data:%s;base64,%s"}},'
+        b'{"type":"text","text":%s}]}],"max_tokens":%d}'
+        % (
+            json.dumps(model).encode("utf-8"),
+            media_type.encode("ascii"),
+            image_data.encode("ascii"),
+            json.dumps(prompt).encode("utf-8"),
+            max_tokens,
+        )
+    )
 
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -328,20 +522,56 @@ def call_vision_api(
         "X-Title": "Claude Code Vision",
     }
 
-    req = Request(
-        f"{OPENROUTER_BASE}/chat/completions",
-        data=json.dumps(payload).encode("utf-8"),
-        headers=headers,
-        method="POST",
-    )
+    status, raw = _openrouter_request("POST", "/chat/completions", body=body, headers=headers)
+    if status != 200:
+        raise RuntimeError(f"Vision API error ({status}): {raw.decode('utf-8', 'replace')}")
+    result = json.loads(raw)
+    return result["choices"][0]["message"]["content"]
 
-    try:
-        with urlopen(req, timeout=120) as resp:
-            result = json.loads(resp.read().decode("utf-8"))
-            return result["choices"][0]["message"]["content"]
-    except HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else str(e)
-        raise RuntimeError(f"Vision API error ({e.code}): {error_body}")
+
+def iter_vision_api_batch(
+    image_path: str,
+    prompts: dict[str, str],
+    model: str | None = None,
+    max_tokens: int = 4096,
+    encoded: tuple[str, str] | None = None,
+) -> Iterator[tuple[str, str]]:
+    """Run several prompts against one image, encoding it only once.
+
+    The prompts fan out through a thread pool so the requests are in
+    flight together instead of paying one round-trip each. Yields
+    (name, response) pairs as each prompt completes, so callers can
+    stream output instead of waiting for the slowest analysis.
+    """
+    api_key = load_api_key()
+    model = model or get_best_vision_model()
+    image_data, media_type = encoded or encode_image(image_path)
+
+    def run(item: tuple[str, str]) -> tuple[str, str]:
+        name, prompt = item
+        return name, _post_image_prompt(api_key, model, image_data, media_type, prompt, max_tokens)
+
+    if len(prompts) == 1:
+        yield run(next(iter(prompts.items())))
+        return
+
+    with ThreadPoolExecutor(max_workers=min(8, len(prompts))) as ex:
+        futures = [ex.submit(run, item) for item in prompts.items()]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def call_vision_api_batch(
+    image_path: str,
+    prompts: dict[str, str],
+    model: str | None = None,
+    max_tokens: int = 4096,
+    encoded: tuple[str, str] | None = None,
+) -> dict[str, str]:
+    """Like iter_vision_api_batch, but collects {name: response} in the
+    order the prompts were given."""
+    results = dict(iter_vision_api_batch(image_path, prompts, model, max_tokens, encoded))
+    return {name: results[name] for name in prompts}
 
 
 def call_vision_api_multi(
@@ -354,9 +584,16 @@ def call_vision_api_multi(
     api_key = load_api_key()
     model = model or get_best_vision_model()
 
+    # Encode in parallel so file reads overlap (b64encode releases the GIL);
+    # skip the pool for a single image where it would only add overhead
+    if len(images) == 1:
+        encoded = [encode_image(images[0][0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(8, len(images))) as ex:
+            encoded = list(ex.map(lambda img: encode_image(img[0]), images))
+
     content = []
-    for image_path, label in images:
-        image_data, media_type = encode_image(image_path)
+    for (_, label), (image_data, media_type) in zip(images, encoded):
         content.append({"type": "text", "text": f"[{label}]"})
         content.append(
             {"type": "image_url", "image_url": {"url": f"data:{media_type};base64,{image_data}"}}
@@ -377,24 +614,20 @@ def call_vision_api_multi(
         "X-Title": "Claude Code Vision",
     }
 
-    req = Request(
-        f"{OPENROUTER_BASE}/chat/completions",
-        data=json.dumps(payload).encode("utf-8"),
-        headers=headers,
-        method="POST",
+    status, raw = _openrouter_request(
+        "POST", "/chat/completions", body=json.dumps(payload).encode("utf-8"), headers=headers
     )
-
-    try:
-        with urlopen(req, timeout=120) as resp:
-            result = json.loads(resp.read().decode("utf-8"))
-            return result["choices"][0]["message"]["content"]
-    except HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else str(e)
-        raise RuntimeError(f"Vision API error ({e.code}): {error_body}")
+    if status != 200:
+        raise RuntimeError(f"Vision API error ({status}): {raw.decode('utf-8', 'replace')}")
+    result = json.loads(raw)
+    return result["choices"][0]["message"]["content"]
 
 
 def clear_cache() -> None:
     """Clear all cached data."""
+    load_api_key.cache_clear()
+    _best_vision_model_cached.cache_clear()
+    _openrouter_model_ids.cache_clear()
     for cache_file in [LMARENA_CACHE, OPENROUTER_CACHE]:
         if cache_file.exists():
             cache_file.unlink()
@@ -4,41 +4,297 @@ Vision API wrapper for image analysis.
 Uses shared utilities from _utils for OpenRouter API access.
 """
 
+import argparse
+import functools
+import hashlib
+import mmap
+import os
+import re
 import sys
 from pathlib import Path
+from types import MappingProxyType
 
-# Add _utils to path for imports
+# Add _utils to path for imports. The _utils bindings themselves are
+# imported inside the branches that need them so trivial commands
+# (set-model, --help) don't pay the transitive import cost at startup.
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "_utils"))
 
-from vision_api import (
-    call_vision_api,
-    clear_cache,
-    get_best_vision_model,
-    get_openrouter_vision_models,
-)
+# orjson round-trips the config several times faster and writes bytes
+# directly; optional, stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Manual override file for this skill
 CONFIG_FILE = Path.home() / ".config" / "image-as-design" / "config.json"
 
+# On-disk response cache: same image + prompt + model never hits the API twice
+RESPONSE_CACHE_DIR = Path.home() / ".cache" / "image-as-design"
+
+# Set by --no-cache to bypass reads and writes of the response cache
+_no_cache = False
+
+# Set by --verbose-prompt to send the long-form prompts instead of the
+# compact defaults
+_verbose_prompts = False
+
+
+# Short-lived base64 cache so repeated invocations against the same image
+# (e.g. one analysis type per shell loop iteration) skip re-encoding
+B64_CACHE_DIR = RESPONSE_CACHE_DIR / "b64"
+
+
+@functools.lru_cache(maxsize=64)
+def _image_hash(image_path: str) -> str:
+    """Content hash of the image, used for cache keys.
+
+    Hashes through an mmap so large screenshots are paged in lazily
+    instead of being read into one big bytes object first. BLAKE2b is
+    used over SHA-256 since cache keys only need a fast fingerprint,
+    not cryptographic collision resistance.
+    """
+    with open(image_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.blake2b(b"", digest_size=8).hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.blake2b(mm, digest_size=8).hexdigest()
+
+
+def _atomic_write(path: Path, data: str) -> None:
+    """Write via a unique temp file + rename.
+
+    mkstemp (rather than a fixed .tmp suffix) so concurrent processes
+    writing the same cache entry can't interleave on a shared temp name.
+    """
+    import tempfile
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _encoded_image(image_path: str) -> tuple[str, str]:
+    """Base64 data and media type, cached on disk by content hash."""
+    from vision_api import encode_image
+
+    cache_file = B64_CACHE_DIR / f"{_image_hash(image_path)}.txt"
+    try:
+        media_type, data = cache_file.read_text().split("\n", 1)
+        return data, media_type
+    except (OSError, ValueError):
+        pass
+    data, media_type = encode_image(image_path)
+    try:
+        _atomic_write(cache_file, f"{media_type}\n{data}")
+    except OSError:
+        pass
+    return data, media_type
+
+
+# Best-model resolution cached across processes; an hour is short enough
+# to track leaderboard changes but amortizes the lookup over a batch of
+# separate CLI invocations
+BEST_MODEL_CACHE = RESPONSE_CACHE_DIR / "best_model.json"
+BEST_MODEL_TTL = 3600
+
+
+@functools.lru_cache(maxsize=1)
+def _resolved_model(model_arg: str | None) -> str:
+    """Resolve the model to use, once per process and cached on disk."""
+    if model_arg:
+        return model_arg
+    import json
+    import time
+
+    try:
+        if time.time() - BEST_MODEL_CACHE.stat().st_mtime < BEST_MODEL_TTL:
+            raw = BEST_MODEL_CACHE.read_bytes()
+            cached = orjson.loads(raw) if orjson else json.loads(raw)
+            if cached.get("model"):
+                return cached["model"]
+    except (OSError, ValueError):
+        pass
+
+    from vision_api import get_best_vision_model
+
+    model = get_best_vision_model(CONFIG_FILE)
+    try:
+        if orjson:
+            _atomic_write(BEST_MODEL_CACHE, orjson.dumps({"model": model}).decode())
+        else:
+            _atomic_write(BEST_MODEL_CACHE, json.dumps({"model": model}))
+    except OSError:
+        pass
+    return model
+
+
+def _cache_path(image_path: str, prompt_id: str, model: str | None) -> Path:
+    model_part = (model or "auto").replace("/", "_")
+    return RESPONSE_CACHE_DIR / f"{_image_hash(image_path)}-{prompt_id}-{model_part}.txt"
+
+
+def _read_cached(path: Path) -> str | None:
+    try:
+        return path.read_text()
+    except OSError:
+        return None
+
+
+def _write_cached(path: Path, result: str) -> None:
+    """Write atomically (tmp + rename) so readers never see partial output."""
+    try:
+        _atomic_write(path, result)
+    except OSError:
+        pass
+
+
+# Transient API failures worth retrying: rate limits and server-side
+# errors, as reported in the shared layer's "Vision API error (NNN)"
+# message format
+_TRANSIENT_STATUS_RE = re.compile(r"\((429|5\d\d)\)")
+
+
+def _retry_transient(func):
+    """Retry transient API failures with jittered exponential backoff.
+
+    Up to 3 attempts; connection-level errors and 429/5xx responses are
+    retried, anything else (bad request, missing key) fails immediately.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        import random
+        import time
+
+        for attempt in range(3):
+            try:
+                return func(*args, **kwargs)
+            except (OSError, TimeoutError):
+                if attempt == 2:
+                    raise
+            except RuntimeError as exc:
+                if attempt == 2 or not _TRANSIENT_STATUS_RE.search(str(exc)):
+                    raise
+            time.sleep(random.uniform(0, min(10.0, 2.0**attempt)))
+
+    return wrapper
+
+
+def _prompt_cache_id(name: str) -> str:
+    """Cache key segment for an analysis type; verbose prompts get their
+    own entries so the two variants never serve each other's responses."""
+    return f"{name}-verbose" if _verbose_prompts else name
+
+
+def _disk_memoize(prompt_id: str):
+    """Serve repeated analyses of the same image/model from disk."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(image_path: str, model: str | None = None) -> str:
+            if _no_cache:
+                return func(image_path, model)
+            path = _cache_path(image_path, _prompt_cache_id(prompt_id), model)
+            cached = _read_cached(path)
+            if cached is not None:
+                return cached
+            result = func(image_path, model)
+            _write_cached(path, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# Parsed config singleton, re-read only when the file's mtime changes
+_config: dict | None = None
+_config_mtime = -1
+
+# mkdir on ~/.config is a syscall round-trip (worse on network mounts);
+# once per process is enough
+_config_dir_ensured = False
+
+
+def _load_config() -> dict:
+    """Return the parsed config, cached until the file changes on disk."""
+    global _config, _config_mtime
+    import json
+
+    try:
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+    except OSError:
+        _config, _config_mtime = {}, -1
+        return _config
+    if _config is None or mtime != _config_mtime:
+        try:
+            raw = CONFIG_FILE.read_bytes()
+            _config = orjson.loads(raw) if orjson else json.loads(raw)
+        except (OSError, ValueError):
+            _config = {}
+        _config_mtime = mtime
+    return _config
+
 
 def set_model_override(model_id: str) -> None:
     """Set a manual model override in config."""
+    global _config_mtime, _config_dir_ensured
     import json
 
-    CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    config = {}
-    if CONFIG_FILE.exists():
-        try:
-            config = json.loads(CONFIG_FILE.read_text())
-        except json.JSONDecodeError:
-            pass
+    config = _load_config()
     config["vision_model_override"] = model_id
-    CONFIG_FILE.write_text(json.dumps(config, indent=2))
+    if not _config_dir_ensured:
+        CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _config_dir_ensured = True
+    if orjson:
+        CONFIG_FILE.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        CONFIG_FILE.write_text(json.dumps(config, indent=2))
+    _config_mtime = CONFIG_FILE.stat().st_mtime_ns
+    # Drop the persisted best-model resolution so the override takes
+    # effect immediately instead of after the TTL expires
+    BEST_MODEL_CACHE.unlink(missing_ok=True)
+    _resolved_model.cache_clear()
     print(f"Set model override: {model_id}")
 
 
-# Agent-specific prompts
-STRUCTURAL_PROMPT = """Analyze this UI design image and provide a detailed structural analysis.
+# Agent-specific prompts. The compact defaults carry the same instructions
+# in a fraction of the tokens, which are billed per image; the verbose
+# originals stay available behind --verbose-prompt.
+STRUCTURAL_PROMPT = """Analyze this UI design image's structure.
+
+Output a coordinate map: every visible element as `element-name: x,y → width,height`, \
+nested to show parent-child relationships. Note z-order, margins/padding/gaps, and \
+alignment. Use pixels for fixed dimensions, percentages for fluid widths."""
+
+DESIGN_INTENTION_PROMPT = """Identify this UI design's intention: primary goal, visual \
+hierarchy (what draws attention first/second/third), intended user flow, emotional tone, \
+interaction hints (elements and their states), and accessibility concerns. Focus on WHY \
+choices were made, not just what they are."""
+
+ELEMENT_CATALOG_PROMPT = """Inventory every visible element in this UI design as a table:
+
+| Element ID | Semantic Type | Content/Purpose | Interactive States |
+
+Use unique ids (e.g. hero-cta), semantic HTML types, and note form input types, image \
+purposes, and icon meanings."""
+
+DESIGN_SYSTEM_PROMPT = """Extract design system tokens from this UI design: colors \
+(primary, background, text, accent, border, shadow), typography (families, weights, \
+sizes, line heights), spacing scale, border radii/widths, and shadows. Map each token \
+to the closest Tailwind utility class, or suggest a custom CSS variable when none fits."""
+
+STRUCTURAL_PROMPT_VERBOSE = """Analyze this UI design image and provide a detailed structural analysis.
 
 Output a coordinate map showing:
 1. Every visible element with its position (x, y) and dimensions (width, height)
@@ -56,7 +312,7 @@ element-name: x,y → width,height
 Be precise with measurements. Use percentages for fluid widths, pixels for fixed dimensions.
 Include alignment info (centered, left-aligned, right-aligned, etc.)."""
 
-DESIGN_INTENTION_PROMPT = """Analyze this UI design image and identify the design intention.
+DESIGN_INTENTION_PROMPT_VERBOSE = """Analyze this UI design image and identify the design intention.
 
 Provide:
 1. **Primary Goal**: What is this UI trying to achieve? (e.g., lead generation, content display, navigation)
@@ -68,7 +324,7 @@ Provide:
 
 Focus on WHY design choices were made, not just WHAT they are."""
 
-ELEMENT_CATALOG_PROMPT = """Analyze this UI design image and create a complete element inventory.
+ELEMENT_CATALOG_PROMPT_VERBOSE = """Analyze this UI design image and create a complete element inventory.
 
 Create a table with ALL visible elements:
 
@@ -86,7 +342,7 @@ Also identify:
 - Images with their apparent purpose (decorative, informational, logo)
 - Any icons and their meaning"""
 
-DESIGN_SYSTEM_PROMPT = """Analyze this UI design image and extract design system tokens.
+DESIGN_SYSTEM_PROMPT_VERBOSE = """Analyze this UI design image and extract design system tokens.
 
 Extract and document:
 
@@ -130,97 +386,262 @@ Map each token to the closest Tailwind utility class:
 If no exact Tailwind match, suggest custom CSS variable."""
 
 
+@_disk_memoize("structural")
+@_retry_transient
 def analyze_structural(image_path: str, model: str | None = None) -> str:
-    return call_vision_api(image_path, STRUCTURAL_PROMPT, model)
+    from vision_api import call_vision_api
+
+    return call_vision_api(
+        image_path, _active_prompt("structural"), model, encoded=_encoded_image(image_path)
+    )
 
 
+@_disk_memoize("intention")
+@_retry_transient
 def analyze_design_intention(image_path: str, model: str | None = None) -> str:
-    return call_vision_api(image_path, DESIGN_INTENTION_PROMPT, model)
+    from vision_api import call_vision_api
 
+    return call_vision_api(
+        image_path, _active_prompt("intention"), model, encoded=_encoded_image(image_path)
+    )
 
+
+@_disk_memoize("elements")
+@_retry_transient
 def analyze_elements(image_path: str, model: str | None = None) -> str:
-    return call_vision_api(image_path, ELEMENT_CATALOG_PROMPT, model)
+    from vision_api import call_vision_api
+
+    return call_vision_api(
+        image_path, _active_prompt("elements"), model, encoded=_encoded_image(image_path)
+    )
 
 
+@_disk_memoize("design-system")
+@_retry_transient
 def analyze_design_system(image_path: str, model: str | None = None) -> str:
-    return call_vision_api(image_path, DESIGN_SYSTEM_PROMPT, model)
+    from vision_api import call_vision_api
 
+    return call_vision_api(
+        image_path, _active_prompt("design-system"), model, encoded=_encoded_image(image_path)
+    )
 
-def main():
-    """CLI interface."""
-    if len(sys.argv) < 2:
-        print("Usage: vision_api.py <command> [args...]")
-        print("\nCommands:")
-        print("  best-model               Show the current best vision model")
-        print("  list-models              List available OpenRouter vision models")
-        print("  set-model <id>           Set manual model override")
-        print("  clear-cache              Clear cached data")
-        print(
-            "  analyze <image> <type>   Run analysis (structural, intention, elements, design-system, all)"
-        )
-        sys.exit(1)
 
-    cmd = sys.argv[1]
+# Analysis registry, frozen at import so main() never rebuilds it:
+# name -> (prompt, analyzer)
+_ANALYZERS = MappingProxyType(
+    {
+        "structural": (STRUCTURAL_PROMPT, analyze_structural),
+        "intention": (DESIGN_INTENTION_PROMPT, analyze_design_intention),
+        "elements": (ELEMENT_CATALOG_PROMPT, analyze_elements),
+        "design-system": (DESIGN_SYSTEM_PROMPT, analyze_design_system),
+    }
+)
 
-    if cmd == "best-model":
-        model = get_best_vision_model(CONFIG_FILE)
-        print(f"Best vision model: {model}")
-        return
+_VERBOSE_PROMPTS = MappingProxyType(
+    {
+        "structural": STRUCTURAL_PROMPT_VERBOSE,
+        "intention": DESIGN_INTENTION_PROMPT_VERBOSE,
+        "elements": ELEMENT_CATALOG_PROMPT_VERBOSE,
+        "design-system": DESIGN_SYSTEM_PROMPT_VERBOSE,
+    }
+)
 
-    if cmd == "list-models":
-        models = get_openrouter_vision_models()
-        print(f"Found {len(models)} vision-capable models:\n")
-        for m in models[:20]:
-            print(f"  {m['id']}")
-        return
 
-    if cmd == "set-model":
-        if len(sys.argv) < 3:
-            print("Usage: vision_api.py set-model <model-id>")
-            sys.exit(1)
-        set_model_override(sys.argv[2])
-        return
+def _active_prompt(name: str) -> str:
+    return _VERBOSE_PROMPTS[name] if _verbose_prompts else _ANALYZERS[name][0]
 
-    if cmd == "clear-cache":
-        clear_cache()
-        return
 
-    if cmd == "analyze":
-        if len(sys.argv) < 4:
-            print("Usage: vision_api.py analyze <image_path> <analysis_type>")
-            sys.exit(1)
-        image_path = sys.argv[2]
-        analysis_type = sys.argv[3]
-        model = sys.argv[4] if len(sys.argv) > 4 else None
-    else:
-        # Legacy mode
-        image_path = cmd
-        if len(sys.argv) < 3:
-            print("Usage: vision_api.py <image_path> <analysis_type> [model]")
-            sys.exit(1)
-        analysis_type = sys.argv[2]
-        model = sys.argv[3] if len(sys.argv) > 3 else None
-
-    analyzers = {
-        "structural": analyze_structural,
-        "intention": analyze_design_intention,
-        "elements": analyze_elements,
-        "design-system": analyze_design_system,
-    }
+def _dump_json(obj) -> str:
+    """Pretty-printed JSON for --format json output."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    import json
+
+    return json.dumps(obj, indent=2)
+
+
+def _cmd_best_model(args):
+    from vision_api import get_best_vision_model
+
+    model = get_best_vision_model(CONFIG_FILE)
+    print(f"Best vision model: {model}")
+
+
+def _cmd_list_models(args):
+    from vision_api import get_openrouter_vision_models
+
+    models = get_openrouter_vision_models()
+    print(f"Found {len(models)} vision-capable models:\n")
+    for m in models[:20]:
+        print(f"  {m['id']}")
 
-    if analysis_type == "all":
-        for name, func in analyzers.items():
-            print(f"\n{'=' * 60}")
-            print(f"=== {name.upper()} ANALYSIS ===")
-            print(f"{'=' * 60}\n")
-            print(func(image_path, model))
-    elif analysis_type in analyzers:
-        print(analyzers[analysis_type](image_path, model))
+
+def _cmd_set_model(args):
+    set_model_override(args.model_id)
+
+
+def _cmd_clear_cache(args):
+    from vision_api import clear_cache
+
+    clear_cache()
+    if RESPONSE_CACHE_DIR.exists():
+        import shutil
+
+        shutil.rmtree(B64_CACHE_DIR, ignore_errors=True)
+        for cached in RESPONSE_CACHE_DIR.glob("*.txt"):
+            cached.unlink()
+        for leftover in RESPONSE_CACHE_DIR.glob("*.tmp"):
+            leftover.unlink()
+        BEST_MODEL_CACHE.unlink(missing_ok=True)
+        print(f"Cleared: {RESPONSE_CACHE_DIR}")
+
+
+def _cmd_analyze_batch(args):
+    # Pipeline a whole folder (or stdin-fed paths) through one process,
+    # amortizing interpreter startup, imports and model resolution
+    if args.source == "-":
+        paths = [line.strip() for line in sys.stdin if line.strip()]
+    elif Path(args.source).is_dir():
+        image_exts = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+        paths = sorted(
+            str(p) for p in Path(args.source).iterdir() if p.suffix.lower() in image_exts
+        )
     else:
-        print(f"Unknown analysis type: {analysis_type}")
-        print(f"Valid types: {', '.join(analyzers.keys())}, all")
+        paths = [args.source]
+    if not paths:
+        print("No images to analyze")
         sys.exit(1)
 
+    from concurrent.futures import ThreadPoolExecutor
+
+    model = _resolved_model(args.model)
+    analyzer = _ANALYZERS[args.analysis_type][1]
+    bar = "=" * 60
+    with ThreadPoolExecutor(max_workers=min(args.concurrency, len(paths))) as ex:
+        results = zip(paths, ex.map(lambda p: analyzer(p, model), paths))
+        if args.format == "json":
+            sys.stdout.write(_dump_json(dict(results)) + "\n")
+            return
+        for path, result in results:
+            sys.stdout.write(f"\n{bar}\n=== {path} ===\n{bar}\n\n{result}\n")
+            sys.stdout.flush()
+
+
+def _cmd_analyze(args):
+    image_path = args.image_path
+    model = _resolved_model(args.model)
+    as_json = args.format == "json"
+
+    if args.analysis_type != "all":
+        result = _ANALYZERS[args.analysis_type][1](image_path, model)
+        if as_json:
+            sys.stdout.write(_dump_json({args.analysis_type: result}) + "\n")
+        else:
+            print(result)
+        return
+
+    # Cached sections print immediately; the rest are in flight together
+    # and print the moment each one completes rather than blocking on the
+    # slowest analysis. JSON output is one object emitted at the end
+    # instead, so downstream consumers parse a single document.
+    results: dict[str, str] = {}
+
+    def emit(name: str, result: str):
+        if as_json:
+            results[name] = result
+            return
+        # One buffered write per section instead of five print() calls
+        bar = "=" * 60
+        sys.stdout.write(f"\n{bar}\n=== {name.upper()} ANALYSIS ===\n{bar}\n\n{result}\n")
+        sys.stdout.flush()
+
+    misses = []
+    for name in _ANALYZERS:
+        cached = (
+            None
+            if _no_cache
+            else _read_cached(_cache_path(image_path, _prompt_cache_id(name), model))
+        )
+        if cached is not None:
+            emit(name, cached)
+        else:
+            misses.append(name)
+    if misses:
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        # Encode once up front so the workers all hit the b64 cache,
+        # then fan out through the analyzers: each one caches its own
+        # result and retries transient failures independently, so one
+        # flaky response never blocks or discards the other sections
+        _encoded_image(image_path)
+        with ThreadPoolExecutor(max_workers=len(misses)) as ex:
+            futures = {
+                ex.submit(_ANALYZERS[name][1], image_path, model): name for name in misses
+            }
+            for future in as_completed(futures):
+                emit(futures[future], future.result())
+    if as_json:
+        # Registry order, regardless of completion order
+        sys.stdout.write(_dump_json({name: results[name] for name in _ANALYZERS}) + "\n")
+
+
+# CLI shape compiled once at import time: dispatch is a single attribute
+# lookup via args.func instead of a cascade of string compares, and
+# argparse owns usage text and choices validation
+_common = argparse.ArgumentParser(add_help=False)
+_common.add_argument("--no-cache", action="store_true", help="bypass the on-disk response cache")
+_common.add_argument(
+    "--verbose-prompt", action="store_true", help="use the long-form analysis prompts"
+)
+_common.add_argument(
+    "--format",
+    choices=("text", "json"),
+    default="text",
+    help="output format: human-readable sections or one JSON object",
+)
+
+_PARSER = argparse.ArgumentParser(prog="vision_api.py", description=__doc__)
+_sub = _PARSER.add_subparsers(dest="cmd", required=True)
+
+_p = _sub.add_parser("best-model", help="show the current best vision model")
+_p.set_defaults(func=_cmd_best_model)
+
+_p = _sub.add_parser("list-models", help="list available OpenRouter vision models")
+_p.set_defaults(func=_cmd_list_models)
+
+_p = _sub.add_parser("set-model", help="set manual model override")
+_p.add_argument("model_id")
+_p.set_defaults(func=_cmd_set_model)
+
+_p = _sub.add_parser("clear-cache", help="clear cached data")
+_p.set_defaults(func=_cmd_clear_cache)
+
+_p = _sub.add_parser("analyze", parents=[_common], help="run analysis on a single image")
+_p.add_argument("image_path")
+_p.add_argument("analysis_type", choices=[*_ANALYZERS, "all"])
+_p.add_argument("model", nargs="?")
+_p.set_defaults(func=_cmd_analyze)
+
+_p = _sub.add_parser(
+    "analyze-batch", parents=[_common], help="analyze many images (dir or paths on stdin)"
+)
+_p.add_argument("source", help="directory of images, or - to read paths from stdin")
+_p.add_argument("analysis_type", choices=list(_ANALYZERS))
+_p.add_argument("model", nargs="?")
+_p.add_argument(
+    "--concurrency", type=int, default=8, help="parallel requests for analyze-batch (default 8)"
+)
+_p.set_defaults(func=_cmd_analyze_batch)
+
+
+def main():
+    """CLI interface."""
+    global _no_cache, _verbose_prompts
+    args = _PARSER.parse_args()
+    _no_cache = getattr(args, "no_cache", False)
+    _verbose_prompts = getattr(args, "verbose_prompt", False)
+    args.func(args)
+
 
 if __name__ == "__main__":
     main()